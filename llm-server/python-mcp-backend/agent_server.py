@@ -1,16 +1,20 @@
 """FastAPI server to expose MCP agent to Electron app with RAG"""
 import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Literal, Union
+import argparse
 import uvicorn
 import os
 import aiofiles
 
 from main import ElectronMCPAgent, app as mcp_app
 from rag_service import get_rag_service, RAGService
+from rag_client import RemoteRAGService
+from ollama_scheduler import get_ollama_scheduler
+from disconnect import run_until_disconnected
 
 
 # Request/Response models
@@ -18,6 +22,8 @@ class ChatRequest(BaseModel):
     message: str
     model: Optional[str] = None
     use_rag: Optional[bool] = False
+    rag_mode: Literal["agent", "synthesis"] = "agent"  # "agent": tools + retrieved context, "synthesis": RAG answer only
+    session_id: Optional[str] = None
 
 
 class ChatResponse(BaseModel):
@@ -46,7 +52,7 @@ class RAGQueryRequest(BaseModel):
 
 # Global instances
 agent_instance: Optional[ElectronMCPAgent] = None
-rag_instance: Optional[RAGService] = None
+rag_instance: Optional[Union[RAGService, RemoteRAGService]] = None
 
 
 @asynccontextmanager
@@ -60,13 +66,20 @@ async def lifespan(app: FastAPI):
         await agent_instance.initialize()
         mcp_agent_app.logger.info("MCP Agent initialized successfully")
 
-        # Initialize RAG service
-        rag_instance = get_rag_service()
-        mcp_agent_app.logger.info("RAG Service initialized successfully")
+        # Initialize RAG service (shared owner process in multi-worker mode)
+        rag_url = os.environ.get("RAG_SERVICE_URL")
+        if rag_url:
+            rag_instance = RemoteRAGService(rag_url)
+            mcp_agent_app.logger.info(f"Using shared RAG Service at {rag_url}")
+        else:
+            rag_instance = get_rag_service()
+            mcp_agent_app.logger.info("RAG Service initialized successfully")
 
         yield
 
         mcp_agent_app.logger.info("Shutting down MCP Agent and RAG Service")
+        if isinstance(rag_instance, RemoteRAGService):
+            await rag_instance.aclose()
 
 
 # Create FastAPI app
@@ -97,6 +110,12 @@ async def health():
     return {"status": "healthy"}
 
 
+@app.get("/ollama/scheduler")
+async def ollama_scheduler_metrics():
+    """Queue depth and wait times of the Ollama scheduler (shared in multi-process mode)"""
+    return await get_ollama_scheduler().aget_metrics()
+
+
 @app.get("/tools", response_model=ToolsResponse)
 async def get_tools():
     """Get available MCP tools"""
@@ -110,40 +129,54 @@ async def get_tools():
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _answer_chat(request: ChatRequest) -> ChatResponse:
+    """Produce the /chat answer (with optional RAG)"""
+    sources = None
+
+    # Use RAG if requested
+    if request.use_rag and rag_instance and request.rag_mode == "synthesis":
+        # Answer from the RAG query engine only, no agent fallback
+        rag_result = await rag_instance.query(request.message)
+        if not rag_result["success"]:
+            raise HTTPException(status_code=502, detail=rag_result.get("error", "RAG query failed"))
+        response = rag_result["response"]
+        sources = rag_result.get("sources", [])
+    elif request.use_rag and rag_instance:
+        # Single agent generation with tools and retrieved context
+        response, sources = await agent_instance.chat_with_rag(
+            request.message,
+            rag_instance,
+            model=request.model,
+            session_id=request.session_id
+        )
+    else:
+        # Regular agent response
+        response = await agent_instance.chat(
+            request.message,
+            model=request.model,
+            session_id=request.session_id
+        )
+
+    return ChatResponse(
+        response=response,
+        model_used=request.model or "llama3.2:1b",
+        sources=sources
+    )
+
+
 @app.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
-    """Send message to agent and get response (with optional RAG)"""
+async def chat(request: ChatRequest, http_request: Request):
+    """Send message to agent and get response (with optional RAG)
+
+    Generation, tool calls and retrieval are cancelled if the client disconnects.
+    """
     if not agent_instance:
         raise HTTPException(status_code=503, detail="Agent not initialized")
 
     try:
-        sources = None
-
-        # Use RAG if requested
-        if request.use_rag and rag_instance:
-            rag_result = await rag_instance.query(request.message)
-            if rag_result["success"]:
-                # Use RAG response
-                response = rag_result["response"]
-                sources = rag_result.get("sources", [])
-            else:
-                # Fallback to regular agent
-                response = await agent_instance.chat(
-                    request.message,
-                    model=request.model
-                )
-        else:
-            # Regular agent response
-            response = await agent_instance.chat(
-                request.message,
-                model=request.model
-            )
-
-        return ChatResponse(
-            response=response,
-            model_used=request.model or "llama3.2:1b",
-            sources=sources
-        )
+        return await run_until_disconnected(http_request, _answer_chat(request))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -176,14 +209,19 @@ async def rag_index_text(request: RAGIndexTextRequest):
 
 
 @app.post("/rag/query")
-async def rag_query(request: RAGQueryRequest):
-    """Query RAG index"""
+async def rag_query(request: RAGQueryRequest, http_request: Request):
+    """Query RAG index (cancelled if the client disconnects)"""
     if not rag_instance:
         raise HTTPException(status_code=503, detail="RAG service not initialized")
 
     try:
-        result = await rag_instance.query(request.question, request.context)
+        result = await run_until_disconnected(
+            http_request,
+            rag_instance.query(request.question, request.context)
+        )
         return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -246,10 +284,22 @@ async def rag_stats():
 
 
 if __name__ == "__main__":
-    uvicorn.run(
-        "agent_server:app",
-        host="127.0.0.1",
-        port=8000,
-        reload=True,
-        log_level="info"
-    )
+    parser = argparse.ArgumentParser(description="Electron MCP Backend")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="Run in production mode with N worker processes")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        from cluster import run_cluster
+        run_cluster(args.workers, args.port)
+    else:
+        # Development mode with auto-reload
+        uvicorn.run(
+            "agent_server:app",
+            host="127.0.0.1",
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
+
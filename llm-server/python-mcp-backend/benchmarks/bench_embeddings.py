@@ -0,0 +1,99 @@
+"""
+Embedding backend benchmark: Ollama vs in-process sentence-transformers
+
+Measures ingest throughput (batch embedding of chunks) and query-embedding
+latency, both one at a time and with concurrent callers (where dynamic
+batching helps). The Ollama backend needs a running daemon with the
+embedding model pulled.
+
+    python benchmarks/bench_embeddings.py --backends ollama local --chunks 256 --queries 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from rag_service import ScheduledOllamaEmbedding, DEFAULT_EMBEDDING_MODELS  # noqa: E402
+
+SAMPLE_SENTENCE = (
+    "The backend indexes workspace documents into ChromaDB and answers questions "
+    "with retrieved context from the local model. "
+)
+
+
+def make_embed_model(backend: str, args):
+    model_name = args.model or DEFAULT_EMBEDDING_MODELS[backend]
+    if backend == "local":
+        from local_embeddings import LocalBatchedEmbedding
+        return LocalBatchedEmbedding(model_name=model_name, backend=args.runtime)
+    return ScheduledOllamaEmbedding(model_name=model_name, base_url=args.ollama_url)
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def concurrent_queries(embed_model, queries):
+    async def one(query):
+        start = time.perf_counter()
+        await embed_model.aget_query_embedding(query)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(q) for q in queries))
+    return latencies, time.perf_counter() - start
+
+
+def run(backend: str, args) -> dict:
+    embed_model = make_embed_model(backend, args)
+    chunks = [f"{i}. " + SAMPLE_SENTENCE * 8 for i in range(args.chunks)]
+    queries = [f"question {i} about indexing documents" for i in range(args.queries)]
+
+    # Warm up (model load, first request)
+    embed_model.get_query_embedding("warm up")
+
+    start = time.perf_counter()
+    embed_model.get_text_embedding_batch(chunks)
+    ingest_seconds = time.perf_counter() - start
+
+    sequential = []
+    for query in queries:
+        start = time.perf_counter()
+        embed_model.get_query_embedding(query)
+        sequential.append(time.perf_counter() - start)
+
+    concurrent, concurrent_seconds = asyncio.run(concurrent_queries(embed_model, queries))
+
+    return {
+        "ingest_chunks_per_s": len(chunks) / ingest_seconds,
+        "query_p50_ms": statistics.median(sequential) * 1000,
+        "query_p95_ms": percentile(sequential, 0.95) * 1000,
+        "concurrent_p95_ms": percentile(concurrent, 0.95) * 1000,
+        "concurrent_queries_per_s": len(queries) / concurrent_seconds,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", default=["ollama", "local"], choices=list(DEFAULT_EMBEDDING_MODELS))
+    parser.add_argument("--model", default=None, help="Override the model for every backend")
+    parser.add_argument("--runtime", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--ollama-url", default="http://localhost:11434")
+    parser.add_argument("--chunks", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    results = {backend: run(backend, args) for backend in args.backends}
+
+    print(f"\n{'backend':>8} {'ingest/s':>9} {'q p50 ms':>9} {'q p95 ms':>9} {'conc p95':>9} {'conc q/s':>9}")
+    for backend, r in results.items():
+        print(
+            f"{backend:>8} {r['ingest_chunks_per_s']:>9.1f} {r['query_p50_ms']:>9.1f} {r['query_p95_ms']:>9.1f} "
+            f"{r['concurrent_p95_ms']:>9.1f} {r['concurrent_queries_per_s']:>9.1f}"
+        )
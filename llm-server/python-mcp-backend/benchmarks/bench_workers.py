@@ -0,0 +1,100 @@
+"""
+Throughput comparison of 1 worker vs N workers
+
+Starts the backend in multi-process mode for each worker count, drives it
+with a fixed number of concurrent clients and prints requests per second.
+Requires Ollama and the MCP servers to be available, like the server itself.
+
+    python benchmarks/bench_workers.py --workers 1 4 --concurrency 16 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def _wait_for_router(url: str, timeout: float = 180.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(1.0)
+    raise RuntimeError(f"Backend at {url} did not start within {timeout}s")
+
+
+async def _drive(url: str, path: str, body: dict, concurrency: int, duration: float) -> dict:
+    """Run closed-loop clients for `duration` seconds"""
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def client_loop(client_id: int, client: httpx.AsyncClient):
+        nonlocal errors
+        payload = dict(body, session_id=f"bench-{client_id}") if path == "/chat" else body
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f"{url}{path}", json=payload)
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except httpx.HTTPError:
+                errors += 1
+
+    async with httpx.AsyncClient(timeout=300.0) as client:
+        await asyncio.gather(*(client_loop(i, client) for i in range(concurrency)))
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+    }
+
+
+def run(workers: int, args) -> dict:
+    url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "agent_server.py", "--workers", str(workers), "--port", str(args.port)],
+        cwd=BACKEND_DIR
+    )
+    try:
+        asyncio.run(_wait_for_router(url))
+        return asyncio.run(_drive(url, args.path, json.loads(args.body), args.concurrency, args.duration))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--path", default="/chat")
+    parser.add_argument("--body", default='{"message": "Say hello in one short sentence."}')
+    args = parser.parse_args()
+
+    results = {workers: run(workers, args) for workers in args.workers}
+
+    baseline = results[args.workers[0]]["throughput"] or 1.0
+    print(f"\n{'workers':>8} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'speedup':>8}")
+    for workers, result in results.items():
+        print(
+            f"{workers:>8} {result['requests']:>9} {result['errors']:>7} "
+            f"{result['throughput']:>8.2f} {result['p50_ms']:>8.0f} {result['throughput'] / baseline:>7.2f}x"
+        )
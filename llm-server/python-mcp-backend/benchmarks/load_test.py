@@ -0,0 +1,284 @@
+"""
+End-to-end load test for the FastAPI backend
+
+Starts a stub Ollama and stub MCP servers, launches agent_server.py against
+them in a scratch directory, then drives it with an open-loop mix of /chat,
+/rag/query, /rag/index-text and /tools requests at increasing arrival rates.
+For every stage it reports throughput, latency percentiles and error rate per
+endpoint, and it names the rate at which the backend saturates.
+
+    python benchmarks/load_test.py --rates 1 2 4 8 16 --duration 30
+    python benchmarks/load_test.py --workers 4 --mix chat=0.7,tools=0.3
+    python benchmarks/load_test.py --url http://127.0.0.1:8000   # existing server, no stubs
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+
+DEFAULT_MIX = "chat=0.5,rag_query=0.2,rag_index_text=0.2,tools=0.1"
+
+
+def _document_text(doc_id: int, words: int = 300) -> str:
+    """Random words seeded by doc_id, so distinct documents never look like near-duplicates"""
+    rng = random.Random(doc_id)
+    return f"Load test document {doc_id}. " + " ".join(f"w{rng.randrange(1_000_000)}" for _ in range(words))
+
+
+def _request_for(endpoint: str, i: int, sessions: int, duplicate_ratio: float = 0.0) -> tuple:
+    """(method, path, json body) for the i-th request to an endpoint"""
+    if endpoint == "chat":
+        return "POST", "/chat", {"message": f"Load test question {i}", "session_id": f"load-{i % sessions}"}
+    if endpoint == "rag_query":
+        return "POST", "/rag/query", {"question": f"What does document {i % 50} say?"}
+    if endpoint == "rag_index_text":
+        # A duplicate re-sends an earlier document's text to exercise deduplication
+        rng = random.Random(f"dup-{i}")
+        doc_id = rng.randrange(i) if i and rng.random() < duplicate_ratio else i
+        text = _document_text(doc_id)
+        return "POST", "/rag/index-text", {"text": text, "metadata": {"source": f"load-{i}"}}
+    if endpoint == "tools":
+        return "GET", "/tools", None
+    raise ValueError(f"Unknown endpoint: {endpoint}")
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        _request_for(name.strip(), 0, 1)  # validates the name
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def run_stage(url: str, rate: float, duration: float, mix: Dict[str, float], args,
+                    request_ids: Iterator[int]) -> dict:
+    """Open-loop arrivals at `rate` req/s for `duration` seconds
+
+    request_ids is shared by all stages, so later stages index new documents.
+    """
+    names, weights = list(mix), list(mix.values())
+    samples: Dict[str, list] = defaultdict(list)   # endpoint -> [(latency, ok)]
+
+    async def send(client: httpx.AsyncClient, endpoint: str, i: int):
+        method, path, body = _request_for(endpoint, i, args.sessions, args.duplicate_ratio)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, f"{url}{path}", json=body)
+            ok = response.status_code < 400 and response.json().get("success", True) is not False
+        except (httpx.HTTPError, ValueError):
+            ok = False
+        samples[endpoint].append((time.perf_counter() - start, ok))
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=100)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as client:
+        tasks = []
+        start = time.perf_counter()
+        next_arrival = start
+        while next_arrival - start < duration:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            endpoint = random.choices(names, weights)[0]
+            tasks.append(asyncio.create_task(send(client, endpoint, next(request_ids))))
+            next_arrival += random.expovariate(rate)
+
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    endpoints = {}
+    for endpoint, results in samples.items():
+        latencies = [latency for latency, ok in results if ok]
+        errors = sum(1 for _, ok in results if not ok)
+        endpoints[endpoint] = {
+            "requests": len(results),
+            "throughput": len(latencies) / elapsed,
+            "error_rate": errors / len(results),
+            "p50_ms": percentile(latencies, 0.50) * 1000,
+            "p95_ms": percentile(latencies, 0.95) * 1000,
+            "p99_ms": percentile(latencies, 0.99) * 1000,
+        }
+
+    total = sum(len(r) for r in samples.values())
+    total_ok = sum(1 for r in samples.values() for _, ok in r if ok)
+    return {
+        "offered_rate": rate,
+        "throughput": total_ok / elapsed,
+        "error_rate": (total - total_ok) / total if total else 0.0,
+        "endpoints": endpoints,
+    }
+
+
+def is_saturated(stage: dict, args) -> Optional[str]:
+    """Reason the stage counts as saturated, or None"""
+    if stage["throughput"] < 0.9 * stage["offered_rate"]:
+        return "throughput below 90% of offered load"
+    if stage["error_rate"] > args.max_error_rate:
+        return f"error rate {stage['error_rate']:.1%}"
+    chat = stage["endpoints"].get("chat")
+    if chat and chat["p99_ms"] > args.chat_p99_slo_ms:
+        return f"/chat p99 {chat['p99_ms']:.0f} ms over SLO"
+    return None
+
+
+def write_stub_config(workdir: str, args):
+    """mcp_agent config whose servers are the stub MCP server (JSON is valid YAML)"""
+    def stub(tool):
+        return {
+            "command": sys.executable,
+            "args": [os.path.join(BENCH_DIR, "stub_mcp_server.py"), "--tool", tool,
+                     "--latency-ms", str(args.tool_latency_ms), "--payload-bytes", str(args.tool_payload_bytes)],
+        }
+
+    config = {
+        "execution_engine": "asyncio",
+        "logger": {"transports": ["console"], "level": "warning"},
+        "mcp": {"servers": {"fetch": stub("fetch"), "filesystem": stub("read_file")}},
+    }
+    with open(os.path.join(workdir, "mcp_agent.config.yaml"), "w") as f:
+        json.dump(config, f, indent=2)
+
+
+async def wait_healthy(url: str, timeout: float = 180.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{url}/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+
+
+def start_stack(workdir: str, args) -> tuple:
+    """Start stub Ollama and the backend; returns (backend url, processes)"""
+    ollama_url = f"http://127.0.0.1:{args.ollama_port}"
+    ollama = subprocess.Popen([
+        sys.executable, os.path.join(BENCH_DIR, "stub_ollama.py"),
+        "--port", str(args.ollama_port),
+        "--chat-latency-ms", str(args.chat_latency_ms),
+        "--embed-latency-ms", str(args.embed_latency_ms),
+        "--tool-call-rate", str(args.tool_call_rate),
+    ])
+
+    write_stub_config(workdir, args)
+    env = dict(os.environ, OLLAMA_BASE_URL=ollama_url)
+
+    if args.workers > 0:
+        command = [sys.executable, os.path.join(BACKEND_DIR, "agent_server.py"),
+                   "--workers", str(args.workers), "--port", str(args.port)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "agent_server:app", "--app-dir", BACKEND_DIR,
+                   "--host", "127.0.0.1", "--port", str(args.port), "--log-level", "warning"]
+
+    # The scratch cwd keeps chroma_db and uploads out of the real workspace
+    backend = subprocess.Popen(command, cwd=workdir, env=env)
+    return f"http://127.0.0.1:{args.port}", [backend, ollama]
+
+
+def print_report(stages: List[dict], args):
+    print(f"\n{'rate':>6} {'endpoint':>15} {'reqs':>6} {'ok/s':>7} {'err%':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for stage in stages:
+        for endpoint, r in sorted(stage["endpoints"].items()):
+            print(
+                f"{stage['offered_rate']:>6.1f} {endpoint:>15} {r['requests']:>6} {r['throughput']:>7.2f} "
+                f"{r['error_rate'] * 100:>5.1f}% {r['p50_ms']:>8.0f} {r['p95_ms']:>8.0f} {r['p99_ms']:>8.0f}"
+            )
+        print(f"{'':>6} {'total':>15} {'':>6} {stage['throughput']:>7.2f} {stage['error_rate'] * 100:>5.1f}%")
+
+    healthy = [s for s in stages if not s.get("saturated")]
+    saturated = [s for s in stages if s.get("saturated")]
+    if saturated:
+        first = saturated[0]
+        last_ok = healthy[-1]["offered_rate"] if healthy else 0.0
+        print(f"\n⚠️ Saturated at {first['offered_rate']} req/s ({first['saturated']}); "
+              f"last healthy rate: {last_ok} req/s")
+    else:
+        print(f"\n✅ No saturation up to {stages[-1]['offered_rate']} req/s")
+
+
+async def run_stages(url: str, mix: Dict[str, float], args) -> List[dict]:
+    await wait_healthy(url)
+    stages = []
+    request_ids = itertools.count()
+    for rate in args.rates:
+        print(f"▶️ {rate} req/s for {args.duration}s")
+        stage = await run_stage(url, rate, args.duration, mix, args, request_ids)
+        stage["saturated"] = is_saturated(stage, args)
+        stages.append(stage)
+        if stage["saturated"] and args.stop_at_saturation:
+            break
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None, help="Target an already running backend instead of starting one")
+    parser.add_argument("--workers", type=int, default=0, help="Start the backend in multi-process mode")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--ollama-port", type=int, default=11500)
+    parser.add_argument("--rates", type=float, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--sessions", type=int, default=20, help="Distinct chat sessions")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.0,
+                        help="Share of rag_index_text requests that repeat an earlier document")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Client timeout, like electron/main.js")
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tool-call-rate", type=float, default=0.3)
+    parser.add_argument("--tool-latency-ms", type=float, default=50.0)
+    parser.add_argument("--tool-payload-bytes", type=int, default=2000)
+    parser.add_argument("--chat-p99-slo-ms", type=float, default=10000.0)
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--stop-at-saturation", action="store_true")
+    parser.add_argument("--json", default=None, help="Also write results to this file")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        stages = asyncio.run(run_stages(args.url.rstrip("/"), mix, args))
+    else:
+        with tempfile.TemporaryDirectory(prefix="mcp-load-") as workdir:
+            url, processes = start_stack(workdir, args)
+            try:
+                stages = asyncio.run(run_stages(url, mix, args))
+            finally:
+                for process in processes:
+                    process.terminate()
+                for process in processes:
+                    try:
+                        process.wait(timeout=30)
+                    except subprocess.TimeoutExpired:
+                        process.kill()
+
+    print_report(stages, args)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"mix": mix, "stages": stages}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
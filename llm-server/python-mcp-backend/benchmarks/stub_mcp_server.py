@@ -0,0 +1,82 @@
+"""
+Stand-in MCP server for load tests
+
+Speaks newline-delimited JSON-RPC over stdio (the MCP stdio transport) with
+no SDK dependency. Exposes one tool that sleeps for a fixed time and returns
+a payload of a fixed size.
+
+    python stub_mcp_server.py --tool fetch --latency-ms 50 --payload-bytes 2000
+"""
+import argparse
+import json
+import sys
+import time
+
+PROTOCOL_VERSION = "2024-11-05"
+
+
+def handle(request: dict, args) -> dict:
+    method = request.get("method")
+
+    if method == "initialize":
+        return {
+            "protocolVersion": request.get("params", {}).get("protocolVersion", PROTOCOL_VERSION),
+            "capabilities": {"tools": {"listChanged": False}},
+            "serverInfo": {"name": f"stub-{args.tool}", "version": "0.1.0"},
+        }
+
+    if method == "ping":
+        return {}
+
+    if method == "tools/list":
+        return {
+            "tools": [{
+                "name": args.tool,
+                "description": f"Stand-in for the {args.tool} tool",
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {"target": {"type": "string"}},
+                },
+            }]
+        }
+
+    if method == "tools/call":
+        time.sleep(args.latency_ms / 1000)
+        return {
+            "content": [{"type": "text", "text": "x" * args.payload_bytes}],
+            "isError": False,
+        }
+
+    # Everything else (resources, prompts) is reported as empty
+    if method in ("resources/list", "prompts/list"):
+        return {method.split("/")[0]: []}
+
+    raise LookupError(method)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tool", default="fetch")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--payload-bytes", type=int, default=2000)
+    args = parser.parse_args()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+
+        request = json.loads(line)
+        if "id" not in request:
+            continue  # notification
+
+        try:
+            response = {"jsonrpc": "2.0", "id": request["id"], "result": handle(request, args)}
+        except LookupError as e:
+            response = {"jsonrpc": "2.0", "id": request["id"], "error": {"code": -32601, "message": f"Method not found: {e}"}}
+
+        sys.stdout.write(json.dumps(response) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Stand-in Ollama daemon for load tests
+
+Implements the endpoints the backend uses (/api/chat, /api/embed,
+/api/embeddings) with fixed latencies, so capacity numbers reflect the
+backend itself rather than the model.
+
+    python stub_ollama.py --port 11500 --chat-latency-ms 300 --tool-call-rate 0.3
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+from datetime import datetime, timezone
+
+import uvicorn
+from fastapi import FastAPI, Request
+
+EMBEDDING_DIM = 768
+
+
+def create_app(chat_latency_ms: float, embed_latency_ms: float, tool_call_rate: float) -> FastAPI:
+    app = FastAPI(title="Stub Ollama")
+
+    def envelope(model: str, **fields) -> dict:
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": 0,
+            "prompt_eval_count": 0,
+            "eval_count": 0,
+            **fields,
+        }
+
+    def vector(text: str) -> list:
+        seed = int.from_bytes(hashlib.sha1(text.encode()).digest()[:8], "big")
+        rng = random.Random(seed)
+        return [rng.uniform(-1.0, 1.0) for _ in range(EMBEDDING_DIM)]
+
+    @app.get("/")
+    async def root():
+        return "Ollama is running"
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        await asyncio.sleep(chat_latency_ms / 1000)
+
+        messages = body.get("messages", [])
+        tools = body.get("tools") or []
+        already_called = any(m.get("role") == "tool" for m in messages[-2:])
+
+        # Ask for a tool on the first round of some turns to exercise the MCP path
+        if tools and not already_called and random.random() < tool_call_rate:
+            name = tools[0]["function"]["name"]
+            message = {
+                "role": "assistant",
+                "content": "",
+                "tool_calls": [{"function": {"name": name, "arguments": json.dumps({"target": "stub"})}}],
+            }
+        else:
+            message = {"role": "assistant", "content": "This is a stub answer from the load-test Ollama."}
+
+        return envelope(body.get("model", "stub"), message=message)
+
+    @app.post("/api/embed")
+    async def embed(request: Request):
+        body = await request.json()
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        await asyncio.sleep(embed_latency_ms / 1000)
+        return envelope(body.get("model", "stub"), embeddings=[vector(text) for text in inputs])
+
+    @app.post("/api/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        await asyncio.sleep(embed_latency_ms / 1000)
+        return {"embedding": vector(body.get("prompt", ""))}
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--chat-latency-ms", type=float, default=300.0)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--tool-call-rate", type=float, default=0.3)
+    args = parser.parse_args()
+
+    uvicorn.run(
+        create_app(args.chat_latency_ms, args.embed_latency_ms, args.tool_call_rate),
+        host="127.0.0.1",
+        port=args.port,
+        log_level="warning"
+    )
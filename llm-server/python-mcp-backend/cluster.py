@@ -0,0 +1,160 @@
+"""
+Multi-process production mode
+
+Layout (with the default port 8000):
+  - router           :8000       public entry point used by Electron
+  - RAG owner        :8100       rag_server.py, owns ChromaDB, ingestion state
+                                 and the Ollama scheduler shared by all processes
+  - agent workers    :8101..     agent_server.py, one process per core
+
+The router pins every /chat session to one worker so conversation memory
+stays consistent, and spreads all other requests round-robin.
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, HTTPException, Request, Response
+
+from disconnect import run_until_disconnected
+
+HOST = "127.0.0.1"
+DEFAULT_SESSION = "default"
+
+# Hop-by-hop headers must not be forwarded by a proxy
+_HOP_HEADERS = {
+    "connection", "keep-alive", "transfer-encoding", "te", "trailer",
+    "upgrade", "proxy-authorization", "proxy-authenticate", "content-length",
+    "host",
+}
+
+
+def _run_rag_owner(port: int):
+    """Process target: the single owner of the vector store"""
+    uvicorn.run("rag_server:app", host=HOST, port=port, log_level="info")
+
+
+def _run_worker(port: int, rag_url: str):
+    """Process target: one agent_server worker using the shared RAG owner"""
+    os.environ["RAG_SERVICE_URL"] = rag_url
+    os.environ["OLLAMA_SCHEDULER_URL"] = rag_url
+    uvicorn.run("agent_server:app", host=HOST, port=port, log_level="info")
+
+
+def create_router(worker_urls: List[str]) -> FastAPI:
+    """Reverse proxy with session affinity for /chat"""
+    round_robin = itertools.cycle(range(len(worker_urls)))
+    client: Optional[httpx.AsyncClient] = None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        nonlocal client
+        client = httpx.AsyncClient(timeout=None)
+        yield
+        await client.aclose()
+
+    router = FastAPI(title="Electron MCP Backend Router", lifespan=lifespan)
+
+    def pick_worker(path: str, body: bytes) -> str:
+        if path == "chat":
+            try:
+                session_id = json.loads(body or b"{}").get("session_id")
+            except (ValueError, AttributeError):
+                session_id = None
+            digest = hashlib.sha1((session_id or DEFAULT_SESSION).encode()).digest()
+            return worker_urls[int.from_bytes(digest[:4], "big") % len(worker_urls)]
+        return worker_urls[next(round_robin)]
+
+    @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "PATCH", "DELETE"])
+    async def proxy(path: str, request: Request):
+        body = await request.body()
+        headers = {k: v for k, v in request.headers.items() if k.lower() not in _HOP_HEADERS}
+
+        try:
+            # Closing the upstream connection lets the worker cancel its work too
+            upstream = await run_until_disconnected(request, client.request(
+                request.method,
+                f"{pick_worker(path, body)}/{path}",
+                params=request.query_params,
+                content=body,
+                headers=headers
+            ))
+        except HTTPException as e:
+            return Response(
+                content=json.dumps({"detail": e.detail}),
+                status_code=e.status_code,
+                media_type="application/json"
+            )
+        except httpx.HTTPError as e:
+            return Response(
+                content=json.dumps({"detail": f"Worker unavailable: {str(e)}"}),
+                status_code=502,
+                media_type="application/json"
+            )
+
+        return Response(
+            content=upstream.content,
+            status_code=upstream.status_code,
+            headers={k: v for k, v in upstream.headers.items() if k.lower() not in _HOP_HEADERS}
+        )
+
+    return router
+
+
+async def _wait_until_healthy(urls: List[str], timeout: float = 120.0):
+    """Block until every process answers /health"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        for url in urls:
+            while True:
+                try:
+                    if (await client.get(f"{url}/health")).status_code == 200:
+                        break
+                except httpx.HTTPError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"{url} did not become healthy within {timeout}s")
+                await asyncio.sleep(0.5)
+
+
+def run_cluster(workers: int, port: int = 8000):
+    """Start the RAG owner, N workers and the router; blocks until shutdown"""
+    rag_port = port + 100
+    rag_url = f"http://{HOST}:{rag_port}"
+    worker_urls = [f"http://{HOST}:{rag_port + i + 1}" for i in range(workers)]
+
+    # Daemon processes are terminated when the router exits
+    processes = [multiprocessing.Process(target=_run_rag_owner, args=(rag_port,), daemon=True)]
+    processes += [
+        multiprocessing.Process(target=_run_worker, args=(rag_port + i + 1, rag_url), daemon=True)
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    try:
+        asyncio.run(_wait_until_healthy([rag_url] + worker_urls))
+        print(f"✅ {workers} workers ready, router listening on http://{HOST}:{port}")
+        uvicorn.run(create_router(worker_urls), host=HOST, port=port, log_level="info")
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join(timeout=10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the backend with several worker processes")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    run_cluster(args.workers, args.port)
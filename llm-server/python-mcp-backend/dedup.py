@@ -0,0 +1,168 @@
+"""
+Chunk deduplication for RAG ingestion
+Drops exact duplicates by content hash and near-duplicates by MinHash + LSH
+"""
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Parameters for the universal hash family used to build MinHash permutations
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_TOKEN_RE = re.compile(r"\w+")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def content_hash(text: str) -> str:
+    """Hash of the whitespace-normalized chunk text"""
+    normalized = _WHITESPACE_RE.sub(" ", text).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class ChunkDeduplicator:
+    """Tracks kept chunks and reports which earlier chunk a new one duplicates"""
+
+    def __init__(
+        self,
+        near_duplicate_threshold: Optional[float] = 0.85,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 5
+    ):
+        """Set near_duplicate_threshold to None to only drop exact duplicates"""
+        if num_perm % bands != 0:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        # Fixed seeds keep signatures stable across restarts
+        self._permutations = [
+            (
+                int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "little") % (_MERSENNE_PRIME - 1) + 1,
+                int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "little") % _MERSENNE_PRIME
+            )
+            for i in range(num_perm)
+        ]
+
+        self.reset()
+
+    def reset(self):
+        """Forget every chunk seen so far"""
+        self._by_hash: Dict[str, str] = {}
+        self._hash_by_id: Dict[str, str] = {}
+        self._signatures: Dict[str, List[int]] = {}
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], List[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_hash)
+
+    def find_duplicate(self, text: str) -> Optional[str]:
+        """Return the id of a kept chunk that `text` duplicates, if any"""
+        kept_id = self._by_hash.get(content_hash(text))
+        if kept_id is not None:
+            return kept_id
+
+        if self.near_duplicate_threshold is None:
+            return None
+
+        signature = self._signature(text)
+        if signature is None:
+            return None
+
+        candidates = set()
+        for key in self._band_keys(signature):
+            candidates.update(self._buckets.get(key, ()))
+
+        best_id, best_score = None, 0.0
+        for candidate_id in candidates:
+            score = self._similarity(signature, self._signatures[candidate_id])
+            if score >= self.near_duplicate_threshold and score > best_score:
+                best_id, best_score = candidate_id, score
+
+        return best_id
+
+    def add(self, chunk_id: str, text: str):
+        """Register a chunk that was kept"""
+        digest = content_hash(text)
+        self._by_hash.setdefault(digest, chunk_id)
+        self._hash_by_id[chunk_id] = digest
+
+        if self.near_duplicate_threshold is None:
+            return
+
+        signature = self._signature(text)
+        if signature is None:
+            return
+
+        self._signatures[chunk_id] = signature
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, []).append(chunk_id)
+
+    def remove(self, chunk_id: str):
+        """Forget a chunk, e.g. one whose insert into the store failed"""
+        digest = self._hash_by_id.pop(chunk_id, None)
+        if digest is not None and self._by_hash.get(digest) == chunk_id:
+            del self._by_hash[digest]
+
+        signature = self._signatures.pop(chunk_id, None)
+        if signature is None:
+            return
+
+        for key in self._band_keys(signature):
+            bucket = self._buckets.get(key)
+            if bucket is not None and chunk_id in bucket:
+                bucket.remove(chunk_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def _shingles(self, text: str) -> set:
+        """Word n-grams of the lowercased text
+
+        Text without word characters (separator lines, ASCII art) uses
+        character n-grams instead; empty text has no shingles.
+        """
+        tokens = _TOKEN_RE.findall(text.lower())
+        if not tokens:
+            chars = _WHITESPACE_RE.sub(" ", text).strip()
+            if len(chars) <= self.shingle_size:
+                return {chars} if chars else set()
+            return {chars[i:i + self.shingle_size] for i in range(len(chars) - self.shingle_size + 1)}
+
+        if len(tokens) <= self.shingle_size:
+            return {" ".join(tokens)}
+
+        return {
+            " ".join(tokens[i:i + self.shingle_size])
+            for i in range(len(tokens) - self.shingle_size + 1)
+        }
+
+    def _signature(self, text: str) -> Optional[List[int]]:
+        """MinHash signature of the chunk's shingle set, None if it has none"""
+        hashes = [
+            int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little") & _MAX_HASH
+            for shingle in self._shingles(text)
+        ]
+        if not hashes:
+            return None
+
+        return [
+            min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+            for a, b in self._permutations
+        ]
+
+    def _band_keys(self, signature: List[int]):
+        """LSH bucket keys, one per band"""
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, tuple(signature[start:start + self.rows])
+
+    @staticmethod
+    def _similarity(left: List[int], right: List[int]) -> float:
+        """Estimated Jaccard similarity of two signatures"""
+        matches = sum(1 for x, y in zip(left, right) if x == y)
+        return matches / len(left)
@@ -0,0 +1,37 @@
+"""Cancel request handling when the HTTP client goes away"""
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import HTTPException, Request
+
+T = TypeVar("T")
+
+# nginx's "client closed request"; nobody reads it, but it shows up in logs
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def run_until_disconnected(request: Request, work: Awaitable[T], poll_interval: float = 0.25) -> T:
+    """Await `work`, cancelling it if the client disconnects first
+
+    Cancellation reaches the Ollama HTTP call, tool calls and RAG queries
+    through the usual asyncio.CancelledError propagation.
+    """
+    task = asyncio.ensure_future(work)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+
+            if await request.is_disconnected():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+                print(f"⚠️ Client disconnected, cancelled {request.method} {request.url.path}")
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client disconnected")
+    finally:
+        # Handler itself cancelled (e.g. server shutdown)
+        if not task.done():
+            task.cancel()
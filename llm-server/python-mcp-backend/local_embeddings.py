@@ -0,0 +1,156 @@
+"""
+In-process CPU embedding backend
+Runs a sentence-transformers model (PyTorch or ONNX) inside the backend and
+batches concurrent requests, instead of one Ollama HTTP round-trip per text
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from pydantic import PrivateAttr
+
+
+def default_num_threads() -> int:
+    """CPU cores available to this process"""
+    if hasattr(os, "sched_getaffinity"):
+        return max(1, len(os.sched_getaffinity(0)))
+    return max(1, os.cpu_count() or 1)
+
+
+class BatchingEmbedder:
+    """Collects embedding requests for a few ms and encodes them as one batch"""
+
+    def __init__(
+        self,
+        model_name: str,
+        backend: str = "torch",
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        num_threads: Optional[int] = None
+    ):
+        from sentence_transformers import SentenceTransformer
+        import torch
+
+        # Pooling and normalization still run in torch with the ONNX runtime
+        self.num_threads = num_threads or default_num_threads()
+        torch.set_num_threads(self.num_threads)
+
+        kwargs = {"backend": backend} if backend != "torch" else {}
+        if backend == "onnx":
+            import onnxruntime
+
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = self.num_threads
+            session_options.inter_op_num_threads = 1
+            kwargs["model_kwargs"] = {"session_options": session_options}
+
+        self.model = SentenceTransformer(model_name, device="cpu", **kwargs)
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._requests: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+        print(f"✅ Local embeddings: {model_name} ({backend}, {self.num_threads} threads, dim {self.dimension})")
+
+    def submit(self, text: str) -> Future:
+        """Queue one text; the future resolves to its embedding"""
+        future: Future = Future()
+        self._requests.put((text, future))
+        return future
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Blocking helper that embeds a list of texts"""
+        futures = [self.submit(text) for text in texts]
+        return [future.result() for future in futures]
+
+    def _run(self):
+        while True:
+            # Block for the first request, then gather more until the batch fills or time runs out
+            batch = [self._requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Drop requests whose callers gave up while queued
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                vectors = self.model.encode(
+                    texts,
+                    batch_size=len(texts),
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), vector in zip(batch, vectors):
+                future.set_result(vector.tolist())
+
+
+class LocalBatchedEmbedding(BaseEmbedding):
+    """LlamaIndex embedding model backed by a BatchingEmbedder"""
+
+    _embedder: BatchingEmbedder = PrivateAttr()
+
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: str = "torch",
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        num_threads: Optional[int] = None,
+        **kwargs
+    ):
+        super().__init__(model_name=model_name, embed_batch_size=max_batch_size, **kwargs)
+        self._embedder = BatchingEmbedder(
+            model_name,
+            backend=backend,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            num_threads=num_threads
+        )
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "LocalBatchedEmbedding"
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._embedder.submit(query).result()
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._embedder.submit(text).result()
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return self._embedder.embed(texts)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return await asyncio.wrap_future(self._embedder.submit(query))
+
+    async def _aget_text_embedding(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._embedder.submit(text))
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.gather(
+            *(asyncio.wrap_future(self._embedder.submit(text)) for text in texts)
+        )
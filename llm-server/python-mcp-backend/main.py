@@ -1,5 +1,6 @@
 import asyncio
 import os
+from collections import OrderedDict
 from typing import Optional
 from mcp_agent.app import MCPApp # type: ignore
 from mcp_agent.agents.agent import Agent # type: ignore
@@ -8,16 +9,19 @@ from mcp_agent.workflows.llm.augmented_llm_base import RequestParams # type: ign
 # Note: mcp-agent doesn't have native Ollama support in the base package
 # We'll create a custom Ollama LLM wrapper
 from workflows.agentic_workflows import OllamaAugmentedLLM
+from workflows.rag_context import build_context_message
 
 app = MCPApp(name="electron_ai_backend")
 
 class ElectronMCPAgent:
     """Main agent class for Electron backend"""
 
-    def __init__(self):
+    def __init__(self, max_sessions: int = 100):
         self.app = app
         self.agent = None
         self.llm = None
+        self.max_sessions = max_sessions
+        self.sessions: "OrderedDict[str, OllamaAugmentedLLM]" = OrderedDict()
 
     async def initialize(self, server_names: list[str] = None): # type: ignore
         """Initialize the agent with specified MCP servers"""
@@ -40,15 +44,87 @@ class ElectronMCPAgent:
 
             return self
 
-    async def chat(self, message: str, model: Optional[str] = None) -> str:
+    async def _llm_for_session(self, session_id: Optional[str]) -> OllamaAugmentedLLM:
+        """Get the LLM holding a session's conversation memory"""
+        if session_id is None:
+            return self.llm
+
+        llm = self.sessions.get(session_id)
+        if llm is None:
+            # Sessions share the default LLM's HTTP client, so evicting a
+            # session never closes a client an in-flight turn is using
+            llm = OllamaAugmentedLLM(
+                agent=self.agent,
+                model=self.llm.default_model,
+                session_id=session_id,
+                client=self.llm.client
+            )
+            self.sessions[session_id] = llm
+
+            # Evict the least recently used session
+            if len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        else:
+            self.sessions.move_to_end(session_id)
+
+        return llm
+
+    async def chat(
+        self,
+        message: str,
+        model: Optional[str] = None,
+        session_id: Optional[str] = None
+    ) -> str:
         """Send a message and get response"""
         if not self.llm:
             raise RuntimeError("Agent not initialized. Call initialize() first.")
 
+        llm = await self._llm_for_session(session_id)
         params = RequestParams(model=model) if model else RequestParams()
-        result = await self.llm.generate_str(message, params)
+        result = await llm.generate_str(message, params)
         return result
 
+    async def chat_with_rag(
+        self,
+        message: str,
+        rag,
+        model: Optional[str] = None,
+        session_id: Optional[str] = None,
+        top_k: int = 5,
+        context_tokens: int = 1500
+    ) -> tuple[str, list]:
+        """Answer with tools and retrieved context in a single generation
+
+        Retrieval and tool preparation run concurrently. If retrieval fails
+        the agent answers without context instead of retrying another path.
+        """
+        if not self.llm:
+            raise RuntimeError("Agent not initialized. Call initialize() first.")
+
+        llm = await self._llm_for_session(session_id)
+
+        tools, retrieval = await asyncio.gather(
+            llm.prepare_tools(),
+            rag.retrieve(message, top_k=top_k)
+        )
+
+        chunks = retrieval.get("chunks", []) if retrieval.get("success") else []
+        # Only the chunks in the prompt, numbered as the model cites them
+        context, included = build_context_message(chunks, max_tokens=context_tokens)
+
+        params = RequestParams(model=model) if model else RequestParams()
+        result = await llm.generate_str(message, params, tools=tools, context=context)
+
+        sources = [
+            {
+                "text": chunk["text"][:200] + "..." if len(chunk["text"]) > 200 else chunk["text"],
+                "score": chunk.get("score"),
+                "metadata": chunk.get("metadata", {})
+            }
+            for chunk in included
+        ]
+        return result, sources
+
     async def get_available_tools(self) -> list:
         """Get list of available tools from MCP servers"""
         if not self.agent:
@@ -0,0 +1,300 @@
+"""
+Central scheduler for all requests to the local Ollama daemon
+
+Every Ollama call (agent chat, RAG synthesis, embeddings) acquires a slot
+here first. Slots are limited to max_in_flight, handed out strictly by
+priority class and round-robin between sessions within a class, so a bulk
+ingestion run cannot starve interactive chat.
+
+Works from both async code (`async with scheduler.slot(...)`) and the
+synchronous LlamaIndex calls running in worker threads
+(`with scheduler.slot_sync(...)`).
+
+In multi-process mode the RAG owner hosts the only OllamaScheduler and
+workers use RemoteOllamaScheduler, which holds a slot for as long as a
+streaming request to the owner's /scheduler/slot stays open.
+"""
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional, Union
+
+import httpx
+
+# Priority classes, lower value is served first
+INTERACTIVE = 0   # agent chat generations
+SYNTHESIS = 1     # RAG answer synthesis and query embeddings
+BACKGROUND = 2    # ingestion embeddings
+
+PRIORITY_NAMES = {
+    INTERACTIVE: "interactive",
+    SYNTHESIS: "synthesis",
+    BACKGROUND: "background",
+}
+
+DEFAULT_SESSION = "default"
+
+# Set while the current task/thread holds a slot, so nested calls
+# (e.g. a batch embedding calling the single-text path) don't deadlock
+_holding_slot: ContextVar[bool] = ContextVar("holding_ollama_slot", default=False)
+
+
+class _Waiter:
+    __slots__ = ("priority", "session_id", "wake", "enqueued_at", "granted")
+
+    def __init__(self, priority: int, session_id: str, wake: Callable[[], None]):
+        self.priority = priority
+        self.session_id = session_id
+        self.wake = wake
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class OllamaScheduler:
+    """Priority + per-session fair queue in front of Ollama"""
+
+    def __init__(self, max_in_flight: int = 2, wait_samples: int = 1000):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        # priority -> session_id -> FIFO of waiters; session order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, deque]"] = {
+            priority: OrderedDict() for priority in PRIORITY_NAMES
+        }
+
+        # Metrics
+        self._granted = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_total = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._wait_max = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._wait_recent = {priority: deque(maxlen=wait_samples) for priority in PRIORITY_NAMES}
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, session_id: Optional[str] = None):
+        """Hold one Ollama slot for the duration of the block"""
+        if _holding_slot.get():
+            yield
+            return
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def set_granted():
+            if not future.done():
+                future.set_result(None)
+
+        waiter = self._enqueue(priority, session_id, lambda: loop.call_soon_threadsafe(set_granted))
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+
+        token = _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            _holding_slot.reset(token)
+            self._release()
+
+    @contextmanager
+    def slot_sync(self, priority: int = INTERACTIVE, session_id: Optional[str] = None):
+        """Blocking variant for code running in a worker thread"""
+        if _holding_slot.get():
+            yield
+            return
+
+        event = threading.Event()
+        self._enqueue(priority, session_id, event.set)
+        event.wait()
+
+        token = _holding_slot.set(True)
+        try:
+            yield
+        finally:
+            _holding_slot.reset(token)
+            self._release()
+
+    def _enqueue(self, priority: int, session_id: Optional[str], wake: Callable[[], None]) -> _Waiter:
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        waiter = _Waiter(priority, session_id or DEFAULT_SESSION, wake)
+        with self._lock:
+            self._queues[priority].setdefault(waiter.session_id, deque()).append(waiter)
+            self._dispatch_locked()
+        return waiter
+
+    def _abandon(self, waiter: _Waiter):
+        """Cancelled while waiting: leave the queue or give back a granted slot"""
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+            else:
+                sessions = self._queues[waiter.priority]
+                pending = sessions.get(waiter.session_id)
+                if pending is not None:
+                    pending.remove(waiter)
+                    if not pending:
+                        del sessions[waiter.session_id]
+            self._dispatch_locked()
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch_locked()
+
+    def _dispatch_locked(self):
+        """Grant free slots to the highest-priority waiters, one session at a time"""
+        while self._in_flight < self.max_in_flight:
+            waiter = self._next_waiter_locked()
+            if waiter is None:
+                return
+
+            waited = time.monotonic() - waiter.enqueued_at
+            self._granted[waiter.priority] += 1
+            self._wait_total[waiter.priority] += waited
+            self._wait_max[waiter.priority] = max(self._wait_max[waiter.priority], waited)
+            self._wait_recent[waiter.priority].append(waited)
+
+            waiter.granted = True
+            self._in_flight += 1
+            waiter.wake()
+
+    def _next_waiter_locked(self) -> Optional[_Waiter]:
+        for priority in sorted(self._queues):
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+
+            session_id, pending = next(iter(sessions.items()))
+            waiter = pending.popleft()
+
+            # Rotate the session to the back so other sessions go next
+            del sessions[session_id]
+            if pending:
+                sessions[session_id] = pending
+
+            return waiter
+
+        return None
+
+    async def aget_metrics(self) -> Dict[str, Any]:
+        return self.get_metrics()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue depth and wait-time statistics per priority class"""
+        with self._lock:
+            classes = {}
+            for priority, name in PRIORITY_NAMES.items():
+                recent = sorted(self._wait_recent[priority])
+                granted = self._granted[priority]
+                classes[name] = {
+                    "queue_depth": sum(len(p) for p in self._queues[priority].values()),
+                    "waiting_sessions": len(self._queues[priority]),
+                    "granted": granted,
+                    "wait_avg_ms": self._wait_total[priority] / granted * 1000 if granted else 0.0,
+                    "wait_p95_ms": recent[min(len(recent) - 1, int(len(recent) * 0.95))] * 1000 if recent else 0.0,
+                    "wait_max_ms": self._wait_max[priority] * 1000,
+                }
+
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self._in_flight,
+                "classes": classes,
+            }
+
+
+class RemoteOllamaScheduler:
+    """Scheduler client for workers; slots are granted by the owner process
+
+    A slot is held while the streaming /scheduler/slot response is open and
+    released when it is closed, so a crashed or cancelled worker can never
+    leak a slot.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=None)
+        self.sync_client = httpx.Client(base_url=self.base_url, timeout=None)
+
+    @staticmethod
+    def _body(priority: int, session_id: Optional[str]) -> dict:
+        return {"priority": priority, "session_id": session_id or DEFAULT_SESSION}
+
+    @asynccontextmanager
+    async def slot(self, priority: int = INTERACTIVE, session_id: Optional[str] = None):
+        if _holding_slot.get():
+            yield
+            return
+
+        granted = False
+        try:
+            async with self.client.stream("POST", "/scheduler/slot", json=self._body(priority, session_id)) as response:
+                response.raise_for_status()
+                # Keep a reference: a collected line iterator closes the stream
+                lines = response.aiter_lines()
+                await lines.__anext__()  # "granted"
+                granted = True
+                token = _holding_slot.set(True)
+                try:
+                    yield
+                finally:
+                    _holding_slot.reset(token)
+        except (httpx.HTTPError, StopAsyncIteration) as e:
+            if granted:
+                raise
+            # Owner unreachable: run unscheduled rather than failing the request
+            print(f"⚠️ Ollama scheduler unavailable ({str(e)}), running unscheduled")
+            yield
+
+    @contextmanager
+    def slot_sync(self, priority: int = INTERACTIVE, session_id: Optional[str] = None):
+        if _holding_slot.get():
+            yield
+            return
+
+        with self.sync_client.stream("POST", "/scheduler/slot", json=self._body(priority, session_id)) as response:
+            response.raise_for_status()
+            lines = response.iter_lines()
+            next(lines)  # "granted"
+            token = _holding_slot.set(True)
+            try:
+                yield
+            finally:
+                _holding_slot.reset(token)
+
+    async def aget_metrics(self) -> Dict[str, Any]:
+        response = await self.client.get("/scheduler")
+        response.raise_for_status()
+        return response.json()
+
+
+# Global scheduler instance
+ollama_scheduler: Optional[Union[OllamaScheduler, RemoteOllamaScheduler]] = None
+
+
+def get_ollama_scheduler() -> Union[OllamaScheduler, RemoteOllamaScheduler]:
+    """Get or create the scheduler
+
+    OLLAMA_MAX_IN_FLIGHT sets the limit. With OLLAMA_SCHEDULER_URL set
+    (multi-process workers) slots come from the owner process instead.
+    """
+    global ollama_scheduler
+    if ollama_scheduler is None:
+        scheduler_url = os.environ.get("OLLAMA_SCHEDULER_URL")
+        if scheduler_url:
+            ollama_scheduler = RemoteOllamaScheduler(scheduler_url)
+        else:
+            ollama_scheduler = OllamaScheduler(
+                max_in_flight=int(os.environ.get("OLLAMA_MAX_IN_FLIGHT", "2"))
+            )
+    return ollama_scheduler
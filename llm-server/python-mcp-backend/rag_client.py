@@ -0,0 +1,52 @@
+"""
+Client for the RAG owner server (rag_server.py)
+Exposes the same async interface as RAGService so workers can use either
+"""
+import os
+from typing import List, Optional, Dict, Any
+import httpx
+
+
+class RemoteRAGService:
+    """RAGService proxy that forwards every call to the owner process"""
+
+    def __init__(self, base_url: str, timeout: float = 300.0):
+        self.base_url = base_url.rstrip("/")
+        self.client = httpx.AsyncClient(base_url=self.base_url, timeout=timeout)
+
+    async def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """Send a request, reporting transport failures like RAGService does"""
+        try:
+            response = await self.client.request(method, path, **kwargs)
+            response.raise_for_status()
+            return response.json()
+        except httpx.HTTPError as e:
+            print(f"❌ RAG owner request failed ({method} {path}): {str(e)}")
+            return {
+                "success": False,
+                "error": f"RAG owner unavailable: {str(e)}",
+                "response": ""
+            }
+
+    async def index_documents(self, file_paths: List[str]) -> Dict[str, Any]:
+        """Index files; paths are made absolute since the owner has its own cwd"""
+        file_paths = [os.path.abspath(path) for path in file_paths]
+        return await self._request("POST", "/index", json={"file_paths": file_paths})
+
+    async def index_text(self, text: str, metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        return await self._request("POST", "/index-text", json={"text": text, "metadata": metadata})
+
+    async def query(self, question: str, context: Optional[str] = None) -> Dict[str, Any]:
+        return await self._request("POST", "/query", json={"question": question, "context": context})
+
+    async def retrieve(self, question: str, top_k: int = 5) -> Dict[str, Any]:
+        return await self._request("POST", "/retrieve", json={"question": question, "top_k": top_k})
+
+    async def clear_index(self) -> Dict[str, Any]:
+        return await self._request("DELETE", "/clear")
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return await self._request("GET", "/stats")
+
+    async def aclose(self):
+        await self.client.aclose()
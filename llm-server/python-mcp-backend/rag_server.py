@@ -0,0 +1,121 @@
+"""
+RAG owner server
+Single process that owns the ChromaDB store and ingestion state, so that
+several agent_server workers can share one index over local HTTP
+"""
+from contextlib import asynccontextmanager
+from typing import Optional, List
+import asyncio
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from rag_service import get_rag_service, RAGService
+from ollama_scheduler import get_ollama_scheduler
+from disconnect import run_until_disconnected
+
+
+class IndexRequest(BaseModel):
+    file_paths: List[str]
+
+
+class IndexTextRequest(BaseModel):
+    text: str
+    metadata: Optional[dict] = None
+
+
+class QueryRequest(BaseModel):
+    question: str
+    context: Optional[str] = None
+
+
+class SlotRequest(BaseModel):
+    priority: int = 0
+    session_id: Optional[str] = None
+
+
+class RetrieveRequest(BaseModel):
+    question: str
+    top_k: int = 5
+
+
+rag_instance: Optional[RAGService] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialize the RAG service once for every worker"""
+    global rag_instance
+    rag_instance = get_rag_service()
+    yield
+
+
+app = FastAPI(
+    title="Electron MCP RAG Owner",
+    description="Shared vector store and ingestion state for backend workers",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
+
+
+@app.get("/scheduler")
+async def scheduler_metrics():
+    return get_ollama_scheduler().get_metrics()
+
+
+# Upper bound on how long a worker may hold a slot (Ollama's timeout is 120s)
+SLOT_MAX_HOLD_SECONDS = 600
+
+
+@app.post("/scheduler/slot")
+async def scheduler_slot(request: SlotRequest):
+    """Grant an Ollama slot to a worker for as long as it keeps this response open"""
+    async def hold():
+        async with get_ollama_scheduler().slot(request.priority, request.session_id):
+            yield b"granted\n"
+            # Released when the worker closes the connection (the stream is cancelled)
+            await asyncio.sleep(SLOT_MAX_HOLD_SECONDS)
+
+    return StreamingResponse(hold(), media_type="text/plain")
+
+
+@app.post("/index")
+async def index_documents(request: IndexRequest):
+    return await rag_instance.index_documents(request.file_paths)
+
+
+@app.post("/index-text")
+async def index_text(request: IndexTextRequest):
+    return await rag_instance.index_text(request.text, request.metadata)
+
+
+@app.post("/query")
+async def query(request: QueryRequest, http_request: Request):
+    # A worker that gave up closes the connection; stop the query too
+    return await run_until_disconnected(
+        http_request,
+        rag_instance.query(request.question, request.context)
+    )
+
+
+@app.post("/retrieve")
+async def retrieve(request: RetrieveRequest, http_request: Request):
+    return await run_until_disconnected(
+        http_request,
+        rag_instance.retrieve(request.question, request.top_k)
+    )
+
+
+@app.delete("/clear")
+async def clear_index():
+    return await rag_instance.clear_index()
+
+
+@app.get("/stats")
+async def get_stats():
+    return await rag_instance.get_stats()
@@ -3,7 +3,10 @@ RAG Service using LlamaIndex with Ollama embeddings and ChromaDB
 Provides document indexing, retrieval, and context-aware chat
 """
 import os
+import re
+import json
 import asyncio
+import threading
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 import chromadb
@@ -20,6 +23,67 @@ from llama_index.llms.ollama import Ollama
 from llama_index.embeddings.ollama import OllamaEmbedding
 from llama_index.core.node_parser import SentenceSplitter
 
+from dedup import ChunkDeduplicator
+from ollama_scheduler import get_ollama_scheduler, SYNTHESIS, BACKGROUND
+
+
+class ScheduledOllama(Ollama):
+    """Ollama LLM whose calls go through the Ollama scheduler"""
+
+    def chat(self, messages, **kwargs):
+        with get_ollama_scheduler().slot_sync(SYNTHESIS, "rag"):
+            return super().chat(messages, **kwargs)
+
+    def complete(self, prompt, formatted=False, **kwargs):
+        with get_ollama_scheduler().slot_sync(SYNTHESIS, "rag"):
+            return super().complete(prompt, formatted=formatted, **kwargs)
+
+    async def achat(self, messages, **kwargs):
+        async with get_ollama_scheduler().slot(SYNTHESIS, "rag"):
+            return await super().achat(messages, **kwargs)
+
+    async def acomplete(self, prompt, formatted=False, **kwargs):
+        async with get_ollama_scheduler().slot(SYNTHESIS, "rag"):
+            return await super().acomplete(prompt, formatted=formatted, **kwargs)
+
+
+class ScheduledOllamaEmbedding(OllamaEmbedding):
+    """Ollama embeddings whose calls go through the Ollama scheduler
+
+    Query embeddings share the synthesis class, ingestion embeddings run as
+    background work.
+    """
+
+    def _get_query_embedding(self, query: str):
+        with get_ollama_scheduler().slot_sync(SYNTHESIS, "rag"):
+            return super()._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str):
+        async with get_ollama_scheduler().slot(SYNTHESIS, "rag"):
+            return await super()._aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str):
+        with get_ollama_scheduler().slot_sync(BACKGROUND, "ingest"):
+            return super()._get_text_embedding(text)
+
+    async def _aget_text_embedding(self, text: str):
+        async with get_ollama_scheduler().slot(BACKGROUND, "ingest"):
+            return await super()._aget_text_embedding(text)
+
+    def _get_text_embeddings(self, texts: List[str]):
+        with get_ollama_scheduler().slot_sync(BACKGROUND, "ingest"):
+            return super()._get_text_embeddings(texts)
+
+    async def _aget_text_embeddings(self, texts: List[str]):
+        async with get_ollama_scheduler().slot(BACKGROUND, "ingest"):
+            return await super()._aget_text_embeddings(texts)
+
+
+DEFAULT_EMBEDDING_MODELS = {
+    "ollama": "nomic-embed-text",
+    "local": "sentence-transformers/all-MiniLM-L6-v2",
+}
+
 
 class RAGService:
     """RAG service for document indexing and retrieval"""
@@ -27,38 +91,70 @@ class RAGService:
     def __init__(
         self,
         ollama_base_url: str = "http://localhost:11434",
-        embedding_model: str = "nomic-embed-text",
+        embedding_model: Optional[str] = None,
         llm_model: str = "llama3.2:1b",
         chroma_path: str = "./chroma_db",
-        collection_name: str = "electron_docs"
+        collection_name: str = "electron_docs",
+        dedup_enabled: bool = True,
+        near_duplicate_threshold: Optional[float] = 0.85,
+        embedding_backend: str = "ollama",
+        local_embedding_runtime: str = "torch"
     ):
-        """Initialize RAG service with Ollama and ChromaDB"""
+        """Initialize RAG service with Ollama and ChromaDB
+
+        embedding_backend is "ollama" (HTTP to the Ollama daemon) or "local"
+        (in-process sentence-transformers, local_embedding_runtime "torch" or "onnx").
+        """
+        if embedding_backend not in DEFAULT_EMBEDDING_MODELS:
+            raise ValueError(f"Unknown embedding backend: {embedding_backend}")
+
         self.ollama_base_url = ollama_base_url
-        self.embedding_model = embedding_model
+        self.embedding_backend = embedding_backend
+        self.local_embedding_runtime = local_embedding_runtime
+        self.embedding_model = embedding_model or DEFAULT_EMBEDDING_MODELS[embedding_backend]
         self.llm_model = llm_model
         self.chroma_path = chroma_path
+        self.dedup_enabled = dedup_enabled
+
+        # Embedding dimensions differ between models, keep their vectors apart;
+        # the default Ollama model keeps the original collection name
+        if self.embedding_model != DEFAULT_EMBEDDING_MODELS["ollama"]:
+            model_slug = re.sub(r"[^A-Za-z0-9_-]", "_", self.embedding_model.split("/")[-1])
+            collection_name = f"{collection_name}_{model_slug}"
         self.collection_name = collection_name
 
+        # Ingestion runs in worker threads; one at a time keeps dedup state consistent
+        self._ingest_lock = threading.Lock()
+
         # Initialize components
         self._setup_llama_index()
         self._setup_chroma()
+        self._setup_dedup(near_duplicate_threshold)
         self.index = None
         self.query_engine = None
 
     def _setup_llama_index(self):
         """Configure LlamaIndex settings"""
         # Setup Ollama LLM
-        self.llm = Ollama(
+        self.llm = ScheduledOllama(
             model=self.llm_model,
             base_url=self.ollama_base_url,
             request_timeout=120.0
         )
 
-        # Setup Ollama embeddings
-        self.embed_model = OllamaEmbedding(
-            model_name=self.embedding_model,
-            base_url=self.ollama_base_url,
-        )
+        # Setup embeddings
+        if self.embedding_backend == "local":
+            # Imported lazily so the Ollama backend doesn't load torch
+            from local_embeddings import LocalBatchedEmbedding
+            self.embed_model = LocalBatchedEmbedding(
+                model_name=self.embedding_model,
+                backend=self.local_embedding_runtime
+            )
+        else:
+            self.embed_model = ScheduledOllamaEmbedding(
+                model_name=self.embedding_model,
+                base_url=self.ollama_base_url,
+            )
 
         # Configure global settings
         Settings.llm = self.llm
@@ -72,7 +168,7 @@ class RAGService:
             chunk_overlap=50
         )
 
-        print(f"✅ LlamaIndex configured with LLM: {self.llm_model}, Embeddings: {self.embedding_model}")
+        print(f"✅ LlamaIndex configured with LLM: {self.llm_model}, Embeddings: {self.embedding_model} ({self.embedding_backend})")
 
     def _setup_chroma(self):
         """Setup ChromaDB vector store"""
@@ -92,6 +188,168 @@ class RAGService:
 
         print(f"✅ ChromaDB initialized at {self.chroma_path}")
 
+    def _setup_dedup(self, near_duplicate_threshold: Optional[float]):
+        """Setup chunk deduplication for ingestion"""
+        self.deduplicator = ChunkDeduplicator(
+            near_duplicate_threshold=near_duplicate_threshold
+        )
+        self._dedup_loaded = False
+        self.dedup_totals = {
+            "duplicates_dropped": 0,
+            "bytes_saved": 0,
+            "embeddings_saved": 0
+        }
+
+    def _load_dedup_state(self):
+        """Seed the deduplicator with chunks already stored in ChromaDB"""
+        if self._dedup_loaded:
+            return
+
+        existing = self.chroma_collection.get(include=["documents"])
+        for chunk_id, text in zip(existing["ids"], existing["documents"]):
+            if text:
+                self.deduplicator.add(chunk_id, text)
+
+        self._dedup_loaded = True
+        print(f"ℹ️ Deduplicator seeded with {len(existing['ids'])} stored chunks")
+
+    @staticmethod
+    def _source_label(node) -> str:
+        """Best identifier of where a chunk came from, for citations"""
+        metadata = node.metadata or {}
+        return (
+            metadata.get("file_path")
+            or metadata.get("file_name")
+            or metadata.get("source")
+            or node.ref_doc_id
+            or node.node_id
+        )
+
+    def _deduplicate_nodes(self, nodes: list) -> tuple:
+        """Drop duplicate chunks, recording their sources on the kept chunk
+
+        Returns (kept nodes, stats, sources to add to already stored chunks).
+        Kept chunks are registered with the deduplicator; callers must
+        forget them again if storing fails.
+        """
+        stats = {
+            "chunks_total": len(nodes),
+            "chunks_kept": len(nodes),
+            "duplicates_dropped": 0,
+            "bytes_saved": 0,
+            "embeddings_saved": 0
+        }
+
+        if not self.dedup_enabled:
+            return nodes, stats, {}
+
+        self._load_dedup_state()
+
+        kept = []
+        kept_sources: Dict[str, List[str]] = {}
+        stored_sources: Dict[str, List[str]] = {}
+
+        for node in nodes:
+            text = node.get_content()
+            source = self._source_label(node)
+            duplicate_of = self.deduplicator.find_duplicate(text)
+
+            if duplicate_of is None:
+                self.deduplicator.add(node.node_id, text)
+                kept_sources[node.node_id] = [source]
+                kept.append(node)
+                continue
+
+            # Chunk duplicates one from this batch or one already stored
+            sources = kept_sources.get(duplicate_of)
+            if sources is None:
+                sources = stored_sources.setdefault(duplicate_of, [])
+            if source not in sources:
+                sources.append(source)
+
+            stats["duplicates_dropped"] += 1
+            stats["bytes_saved"] += len(text.encode("utf-8"))
+
+        # Chroma metadata must be flat, so the source list is stored as JSON
+        for node in kept:
+            node.metadata["sources"] = json.dumps(kept_sources[node.node_id])
+            node.excluded_embed_metadata_keys.append("sources")
+            node.excluded_llm_metadata_keys.append("sources")
+
+        stats["chunks_kept"] = len(kept)
+        stats["embeddings_saved"] = stats["duplicates_dropped"]
+
+        return kept, stats, stored_sources
+
+    def _add_stored_sources(self, new_sources: Dict[str, List[str]]):
+        """Append sources to chunks that are already in ChromaDB"""
+        existing = self.chroma_collection.get(
+            ids=list(new_sources.keys()),
+            include=["metadatas"]
+        )
+
+        ids, metadatas = [], []
+        for chunk_id, metadata in zip(existing["ids"], existing["metadatas"]):
+            metadata = dict(metadata or {})
+            sources = json.loads(metadata.get("sources", "[]"))
+            sources += [s for s in new_sources[chunk_id] if s not in sources]
+            metadata["sources"] = json.dumps(sources)
+
+            # LlamaIndex rebuilds nodes from the serialized copy, keep it in sync
+            if "_node_content" in metadata:
+                node_content = json.loads(metadata["_node_content"])
+                node_content.setdefault("metadata", {})["sources"] = metadata["sources"]
+                metadata["_node_content"] = json.dumps(node_content)
+
+            ids.append(chunk_id)
+            metadatas.append(metadata)
+
+        if ids:
+            self.chroma_collection.update(ids=ids, metadatas=metadatas)
+
+    def _ingest_documents(self, documents: list, show_progress: bool = False) -> Dict[str, Any]:
+        """Split, deduplicate, embed and store documents (blocking)"""
+        with self._ingest_lock:
+            # Split and drop duplicate chunks before paying for embeddings
+            nodes = self.text_splitter.get_nodes_from_documents(documents)
+            nodes, dedup_stats, stored_sources = self._deduplicate_nodes(nodes)
+
+            # Create or update index; a failed insert must not leave
+            # unstored chunks behind as dedup targets
+            try:
+                self._insert_nodes(nodes, show_progress=show_progress)
+            except Exception:
+                for node in nodes:
+                    self.deduplicator.remove(node.node_id)
+                raise
+
+            if stored_sources:
+                self._add_stored_sources(stored_sources)
+            for key in self.dedup_totals:
+                self.dedup_totals[key] += dedup_stats[key]
+
+            # Create query engine
+            self.query_engine = self.index.as_query_engine(
+                similarity_top_k=5,
+                streaming=False
+            )
+
+            return dedup_stats
+
+    def _insert_nodes(self, nodes: list, show_progress: bool = False):
+        """Embed and store nodes, creating the index on first use"""
+        if self.index is None:
+            storage_context = StorageContext.from_defaults(
+                vector_store=self.vector_store
+            )
+            self.index = VectorStoreIndex(
+                nodes,
+                storage_context=storage_context,
+                show_progress=show_progress
+            )
+        elif nodes:
+            self.index.insert_nodes(nodes)
+
     async def index_documents(self, file_paths: List[str]) -> Dict[str, Any]:
         """Index multiple documents into the vector store"""
         try:
@@ -117,30 +375,21 @@ class RAGService:
                     "indexed": 0
                 }
 
-            # Create storage context
-            storage_context = StorageContext.from_defaults(
-                vector_store=self.vector_store
-            )
-
-            # Create or update index
-            self.index = VectorStoreIndex.from_documents(
-                documents,
-                storage_context=storage_context,
-                show_progress=True
+            # Embedding calls block, keep them off the event loop
+            dedup_stats = await asyncio.to_thread(
+                self._ingest_documents, documents, True
             )
 
-            # Create query engine
-            self.query_engine = self.index.as_query_engine(
-                similarity_top_k=5,
-                streaming=False
+            print(
+                f"✅ Indexed {len(documents)} documents "
+                f"({dedup_stats['chunks_kept']} chunks, {dedup_stats['duplicates_dropped']} duplicates dropped)"
             )
 
-            print(f"✅ Indexed {len(documents)} documents")
-
             return {
                 "success": True,
                 "indexed": len(documents),
-                "files": file_paths
+                "files": file_paths,
+                "dedup": dedup_stats
             }
 
         except Exception as e:
@@ -160,32 +409,16 @@ class RAGService:
                 metadata=metadata or {}
             )
 
-            # Create storage context
-            storage_context = StorageContext.from_defaults(
-                vector_store=self.vector_store
-            )
-
-            # Create or update index
-            if self.index is None:
-                self.index = VectorStoreIndex.from_documents(
-                    [doc],
-                    storage_context=storage_context
-                )
-            else:
-                self.index.insert(doc)
-
-            # Create/update query engine
-            self.query_engine = self.index.as_query_engine(
-                similarity_top_k=5,
-                streaming=False
-            )
+            # Embedding calls block, keep them off the event loop
+            dedup_stats = await asyncio.to_thread(self._ingest_documents, [doc])
 
             print(f"✅ Indexed text ({len(text)} chars)")
 
             return {
                 "success": True,
                 "indexed": 1,
-                "chars": len(text)
+                "chars": len(text),
+                "dedup": dedup_stats
             }
 
         except Exception as e:
@@ -213,8 +446,8 @@ class RAGService:
             if context:
                 question = f"Context: {context}\n\nQuestion: {question}"
 
-            # Query the index
-            response = self.query_engine.query(question)
+            # Async path so a cancelled request also aborts the Ollama calls
+            response = await self.query_engine.aquery(question)
 
             # Extract source nodes
             sources = []
@@ -223,7 +456,7 @@ class RAGService:
                     sources.append({
                         "text": node.text[:200] + "..." if len(node.text) > 200 else node.text,
                         "score": node.score if hasattr(node, 'score') else None,
-                        "metadata": node.metadata if hasattr(node, 'metadata') else {}
+                        "metadata": self._node_metadata(node)
                     })
 
             return {
@@ -241,6 +474,52 @@ class RAGService:
                 "response": ""
             }
 
+    async def retrieve(self, question: str, top_k: int = 5) -> Dict[str, Any]:
+        """Retrieve the top chunks for a question without synthesizing an answer"""
+        try:
+            if self.index is None:
+                await self._load_existing_index()
+
+                if self.index is None:
+                    return {
+                        "success": False,
+                        "error": "No documents indexed. Please index documents first.",
+                        "chunks": []
+                    }
+
+            retriever = self.index.as_retriever(similarity_top_k=top_k)
+            nodes = await retriever.aretrieve(question)
+
+            chunks = [
+                {
+                    "text": node.get_content(),
+                    "score": node.score,
+                    "metadata": self._node_metadata(node)
+                }
+                for node in nodes
+            ]
+
+            return {
+                "success": True,
+                "chunks": chunks
+            }
+
+        except Exception as e:
+            print(f"❌ Error retrieving: {str(e)}")
+            return {
+                "success": False,
+                "error": str(e),
+                "chunks": []
+            }
+
+    @staticmethod
+    def _node_metadata(node) -> Dict[str, Any]:
+        """Node metadata with the stored source list decoded"""
+        metadata = dict(node.metadata) if hasattr(node, 'metadata') else {}
+        if "sources" in metadata:
+            metadata["sources"] = json.loads(metadata["sources"])
+        return metadata
+
     async def _load_existing_index(self):
         """Load existing index from ChromaDB"""
         try:
@@ -287,9 +566,11 @@ class RAGService:
             # Recreate vector store
             self.vector_store = ChromaVectorStore(chroma_collection=self.chroma_collection)
 
-            # Reset index and query engine
+            # Reset index, query engine and dedup state
             self.index = None
             self.query_engine = None
+            self.deduplicator.reset()
+            self._dedup_loaded = False
 
             print("✅ Index cleared")
 
@@ -315,7 +596,9 @@ class RAGService:
                 "total_documents": count,
                 "collection_name": self.collection_name,
                 "embedding_model": self.embedding_model,
-                "llm_model": self.llm_model
+                "embedding_backend": self.embedding_backend,
+                "llm_model": self.llm_model,
+                "dedup": dict(self.dedup_totals)
             }
 
         except Exception as e:
@@ -330,9 +613,36 @@ class RAGService:
 rag_service: Optional[RAGService] = None
 
 
+def _dedup_threshold_from_env() -> Optional[float]:
+    """RAG_DEDUP_THRESHOLD: unset uses 0.85, empty means exact duplicates only"""
+    value = os.environ.get("RAG_DEDUP_THRESHOLD")
+    if value is None:
+        return 0.85
+    if not value.strip():
+        return None
+
+    threshold = float(value)
+    if not 0.0 < threshold <= 1.0:
+        raise ValueError(f"RAG_DEDUP_THRESHOLD must be in (0, 1], got {value}")
+    return threshold
+
+
 def get_rag_service() -> RAGService:
-    """Get or create RAG service instance"""
+    """Get or create RAG service instance
+
+    OLLAMA_BASE_URL points at the Ollama daemon; RAG_EMBEDDING_BACKEND,
+    RAG_EMBEDDING_MODEL and RAG_EMBEDDING_RUNTIME select the embedding backend;
+    RAG_DEDUP=0 disables chunk deduplication and RAG_DEDUP_THRESHOLD sets the
+    near-duplicate similarity.
+    """
     global rag_service
     if rag_service is None:
-        rag_service = RAGService()
+        rag_service = RAGService(
+            ollama_base_url=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"),
+            dedup_enabled=os.environ.get("RAG_DEDUP", "1").strip().lower() not in ("0", "false", "no", "off"),
+            near_duplicate_threshold=_dedup_threshold_from_env(),
+            embedding_backend=os.environ.get("RAG_EMBEDDING_BACKEND", "ollama"),
+            embedding_model=os.environ.get("RAG_EMBEDDING_MODEL"),
+            local_embedding_runtime=os.environ.get("RAG_EMBEDDING_RUNTIME", "torch")
+        )
     return rag_service
@@ -1,4 +1,6 @@
 """Workflows package"""
 from .agentic_workflows import OllamaAugmentedLLM
+from .rag_context import build_context_message
+from .tool_output import ToolOutputPipeline
 
-__all__ = ["OllamaAugmentedLLM"]
+__all__ = ["OllamaAugmentedLLM", "build_context_message", "ToolOutputPipeline"]
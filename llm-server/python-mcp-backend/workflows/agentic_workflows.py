@@ -1,6 +1,8 @@
 """Custom Ollama integration for mcp-agent"""
+import asyncio
 import httpx
 import json
+import os
 from typing import Any, Optional
 from mcp_agent.workflows.llm.augmented_llm_base import (
     AugmentedLLM,
@@ -9,6 +11,9 @@ from mcp_agent.workflows.llm.augmented_llm_base import (
     GenerateResult,
 )
 
+from ollama_scheduler import get_ollama_scheduler, INTERACTIVE
+from .tool_output import ToolOutputPipeline, READ_MORE_TOOL, DEFAULT_LIMIT, result_text
+
 
 class OllamaAugmentedLLM(AugmentedLLM):
     """Ollama implementation of AugmentedLLM"""
@@ -16,14 +21,22 @@ class OllamaAugmentedLLM(AugmentedLLM):
     def __init__(
         self,
         agent,
-        base_url: str = "http://localhost:11434",
+        base_url: Optional[str] = None,
         model: str = "llama3.2:1b",
+        session_id: Optional[str] = None,
+        client: Optional[httpx.AsyncClient] = None,
         **kwargs
     ):
         super().__init__(agent, **kwargs)
-        self.base_url = base_url
+        self.base_url = base_url or os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
         self.default_model = model
-        self.client = httpx.AsyncClient(timeout=120.0)
+        self.session_id = session_id
+        # A shared client (passed in) is closed by its owner, not here
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(timeout=120.0)
+        self.tool_outputs = ToolOutputPipeline()
+        # One turn at a time per session, so a cancelled turn can't drop another turn's messages
+        self._turn_lock = asyncio.Lock()
 
     async def generate(
         self,
@@ -31,7 +44,33 @@ class OllamaAugmentedLLM(AugmentedLLM):
         params: Optional[RequestParams] = None,
         **kwargs
     ) -> GenerateResult:
-        """Generate response with tool calling support"""
+        """Generate response with tool calling support
+
+        Turns of a session run one after another. If a turn is cancelled
+        (client disconnected), only the messages it appended are removed.
+        """
+        async with self._turn_lock:
+            start = len(self.memory.get_messages())
+            try:
+                return await self._generate_turn(message, params, **kwargs)
+            except asyncio.CancelledError:
+                self._truncate_memory(start)
+                raise
+
+    def _truncate_memory(self, length: int):
+        """Drop messages added after the first `length` ones"""
+        kept = list(self.memory.get_messages())[:length]
+        self.memory.clear()
+        for msg in kept:
+            self.memory.add_message(msg)
+
+    async def _generate_turn(
+        self,
+        message: str | Message,
+        params: Optional[RequestParams] = None,
+        **kwargs
+    ) -> GenerateResult:
+        """One Ollama round, recursing while the model requests tools"""
         if params is None:
             params = RequestParams()
 
@@ -46,8 +85,10 @@ class OllamaAugmentedLLM(AugmentedLLM):
         # Add to conversation history
         self.memory.add_message(user_message)
 
-        # Get tools from agent
-        tools = await self._format_tools_for_ollama()
+        # Get tools from agent (callers may have prepared them concurrently)
+        tools = kwargs.get("tools")
+        if tools is None:
+            tools = await self._format_tools_for_ollama()
 
         # Prepare messages
         messages = [
@@ -55,6 +96,11 @@ class OllamaAugmentedLLM(AugmentedLLM):
             for msg in self.memory.get_messages()
         ]
 
+        # Retrieved context applies to this turn only and is not kept in memory
+        context = kwargs.get("context")
+        if context:
+            messages.insert(0, {"role": "system", "content": context})
+
         # Call Ollama API
         payload = {
             "model": model,
@@ -65,10 +111,11 @@ class OllamaAugmentedLLM(AugmentedLLM):
         if tools:
             payload["tools"] = tools
 
-        response = await self.client.post(
-            f"{self.base_url}/api/chat",
-            json=payload
-        )
+        async with get_ollama_scheduler().slot(INTERACTIVE, self.session_id):
+            response = await self.client.post(
+                f"{self.base_url}/api/chat",
+                json=payload
+            )
         response.raise_for_status()
 
         result = response.json()
@@ -88,7 +135,7 @@ class OllamaAugmentedLLM(AugmentedLLM):
                 ))
 
             # Recursive call to get final answer
-            return await self.generate("", params)
+            return await self._generate_turn("", params, tools=tools, context=context)
 
         # Add assistant response to memory
         assistant_response = Message(
@@ -112,6 +159,10 @@ class OllamaAugmentedLLM(AugmentedLLM):
         result = await self.generate(message, params, **kwargs)
         return result.message.content
 
+    async def prepare_tools(self) -> list:
+        """Tool schemas in Ollama format, for passing to generate(tools=...)"""
+        return await self._format_tools_for_ollama()
+
     async def _format_tools_for_ollama(self) -> list:
         """Convert MCP tools to Ollama format"""
         tools = await self.agent.list_tools()
@@ -127,22 +178,48 @@ class OllamaAugmentedLLM(AugmentedLLM):
                 }
             })
 
+        # Lets the model page through results that were truncated
+        if ollama_tools:
+            ollama_tools.append(self.tool_outputs.tool_schema())
+
         return ollama_tools
 
     async def _execute_tool_calls(self, tool_calls: list) -> list:
-        """Execute MCP tool calls"""
+        """Execute MCP tool calls, returning compacted results for the prompt"""
         results = []
 
         for tool_call in tool_calls:
             function = tool_call.get("function", {})
             tool_name = function.get("name")
-            arguments = json.loads(function.get("arguments", "{}"))
 
-            # Call MCP tool
-            result = await self.agent.call_tool(tool_name, arguments)
+            # Ollama sends arguments as an object, other servers as a JSON string
+            arguments = function.get("arguments") or {}
+            if isinstance(arguments, str):
+                arguments = json.loads(arguments or "{}")
+
+            if tool_name == READ_MORE_TOOL:
+                text = self.tool_outputs.read_more(
+                    str(arguments.get("ref", "")),
+                    arguments.get("offset", 0),
+                    arguments.get("length", DEFAULT_LIMIT)
+                )
+            else:
+                if not self.tool_outputs.is_cacheable(tool_name):
+                    # Writes, moves, edits... may change what cached reads returned
+                    self.tool_outputs.invalidate()
+
+                text = self.tool_outputs.cache_get(tool_name, arguments)
+                if text is None:
+                    # Call MCP tool
+                    result = await self.agent.call_tool(tool_name, arguments)
+                    text, is_error = result_text(result)
+                    if not is_error:
+                        self.tool_outputs.cache_put(tool_name, arguments, text)
+                text = self.tool_outputs.compact(tool_name, text)
+
             results.append({
                 "tool_call_id": tool_call.get("id"),
-                "result": result
+                "result": text
             })
 
         return results
@@ -151,4 +228,5 @@ class OllamaAugmentedLLM(AugmentedLLM):
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        await self.client.aclose()
+        if self._owns_client:
+            await self.client.aclose()
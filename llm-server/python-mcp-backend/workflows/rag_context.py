@@ -0,0 +1,79 @@
+"""Fit retrieved RAG chunks into the agent prompt within a token budget"""
+import json
+from typing import List, Optional, Tuple
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file can't be downloaded
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (Ollama models use their own tokenizers)"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text, disallowed_special=())[:max_tokens])
+    return text[:max_tokens * 4]
+
+
+def _cite(metadata: dict, max_sources: int = 3) -> str:
+    """Source label of a chunk; deduplicated chunks list every document they appeared in"""
+    sources = metadata.get("sources")
+    if isinstance(sources, str):
+        try:
+            sources = json.loads(sources)
+        except ValueError:
+            sources = None
+
+    if sources:
+        label = ", ".join(str(source) for source in sources[:max_sources])
+        if len(sources) > max_sources:
+            label += f", +{len(sources) - max_sources} more"
+        return label
+
+    return metadata.get("file_name") or metadata.get("file_path") or metadata.get("source") or "text"
+
+
+def build_context_message(chunks: List[dict], max_tokens: int = 1500) -> Tuple[Optional[str], List[dict]]:
+    """System prompt with the highest-scoring chunks that fit in max_tokens
+
+    Also returns the chunks that made it into the prompt, in the order they
+    are numbered, so the caller can report exactly the sources the model saw.
+    """
+    if not chunks or max_tokens <= 0:
+        return None, []
+
+    header = (
+        "Use the following excerpts from the user's indexed documents when they "
+        "are relevant. Cite them by number. You can still use tools.\n"
+    )
+    remaining = max_tokens - count_tokens(header)
+    parts = [header]
+    included = []
+
+    ranked = sorted(chunks, key=lambda c: c.get("score") or 0.0, reverse=True)
+    for number, chunk in enumerate(ranked, start=1):
+        part = f"\n[{number}] ({_cite(chunk.get('metadata') or {})})\n{chunk['text']}\n"
+
+        tokens = count_tokens(part)
+        if tokens > remaining:
+            # Keep a truncated excerpt if there's meaningful room left
+            if remaining > 50:
+                parts.append(_truncate_to_tokens(part, remaining))
+                included.append(chunk)
+            break
+
+        parts.append(part)
+        included.append(chunk)
+        remaining -= tokens
+
+    if not included:
+        return None, []
+
+    return "".join(parts), included
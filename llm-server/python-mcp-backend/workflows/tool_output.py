@@ -0,0 +1,276 @@
+"""Compact and cache MCP tool results before they enter the prompt"""
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from html.parser import HTMLParser
+from typing import Any, Dict, Optional, Tuple
+
+# Synthetic tool the model can call to page through a truncated result
+READ_MORE_TOOL = "read_tool_output"
+
+# Max characters of a tool result sent to the model (~4 chars per token)
+DEFAULT_LIMIT = 4000
+TOOL_LIMITS = {
+    "fetch": 6000,
+    "read_file": 6000,
+    "read_text_file": 6000,
+    "read_multiple_files": 8000,
+    "list_directory": 3000,
+    "directory_tree": 3000,
+    "search_files": 3000,
+}
+
+# Idempotent tools whose results may be reused, with their TTL in seconds
+CACHEABLE_TOOLS = {
+    "fetch": 300,
+    "read_file": 30,
+    "read_text_file": 30,
+    "read_multiple_files": 30,
+    "list_directory": 30,
+    "directory_tree": 30,
+    "search_files": 30,
+    "get_file_info": 30,
+    "list_allowed_directories": 300,
+}
+
+LISTING_TOOLS = {"list_directory", "directory_tree", "search_files"}
+
+# Tools returning web pages; only their HTML is converted to text
+FETCH_TOOLS = {"fetch"}
+
+# MCP servers (mcp_agent.config.yaml) whose tools the tables above describe;
+# tools of other servers (e.g. git_fetch) never match
+KNOWN_SERVERS = ("fetch", "filesystem")
+
+_HTML_RE = re.compile(r"<(html|head|body|div|p|table|article)\b", re.IGNORECASE)
+
+
+def _match_tool(tool_name: str, table) -> Optional[str]:
+    """Find a tool's entry by exact name or as '<known server>_<name>'"""
+    if tool_name in table:
+        return tool_name
+    for server in KNOWN_SERVERS:
+        for separator in ("_", "-"):
+            prefix = f"{server}{separator}"
+            if tool_name.startswith(prefix) and tool_name[len(prefix):] in table:
+                return tool_name[len(prefix):]
+    return None
+
+
+def result_text(result: Any) -> Tuple[str, bool]:
+    """Text content of an MCP CallToolResult (or dict), and whether it is an error"""
+    if isinstance(result, dict):
+        content, is_error = result.get("content"), result.get("isError", False)
+    else:
+        content, is_error = getattr(result, "content", None), getattr(result, "isError", False)
+
+    if content is None:
+        return (result if isinstance(result, str) else json.dumps(result, default=str)), bool(is_error)
+
+    parts = []
+    for item in content:
+        text = item.get("text") if isinstance(item, dict) else getattr(item, "text", None)
+        parts.append(text if text is not None else f"[{getattr(item, 'type', 'non-text')} content omitted]")
+    return "\n".join(parts), bool(is_error)
+
+
+class _TextExtractor(HTMLParser):
+    """Visible text of an HTML page, one block element per line"""
+
+    _SKIP = {"script", "style", "noscript", "svg", "head"}
+    _BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "article"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts = []
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self._SKIP:
+            self._skipping += 1
+        elif tag in self._BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self._SKIP and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if not self._skipping:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    text = "".join(extractor.parts)
+    lines = (re.sub(r"[ \t]+", " ", line).strip() for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+class ToolOutputPipeline:
+    """Per-session tool result cache, compaction and full-payload store"""
+
+    def __init__(self, max_cache_entries: int = 128, max_stored: int = 64):
+        self.max_cache_entries = max_cache_entries
+        self.max_stored = max_stored
+        self._cache: "OrderedDict[tuple, Tuple[float, str]]" = OrderedDict()
+        self._stored: "OrderedDict[str, str]" = OrderedDict()
+
+    # Cache
+
+    def is_cacheable(self, tool_name: str) -> bool:
+        return _match_tool(tool_name, CACHEABLE_TOOLS) is not None
+
+    def invalidate(self):
+        """Drop cached results, e.g. after a tool that may have changed files"""
+        self._cache.clear()
+
+    def cache_get(self, tool_name: str, arguments: dict) -> Optional[str]:
+        key = self._cache_key(tool_name, arguments)
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+
+        expires_at, text = entry
+        if time.monotonic() > expires_at:
+            del self._cache[key]
+            return None
+
+        self._cache.move_to_end(key)
+        return text
+
+    def cache_put(self, tool_name: str, arguments: dict, text: str):
+        name = _match_tool(tool_name, CACHEABLE_TOOLS)
+        if name is None:
+            return
+
+        self._cache[self._cache_key(tool_name, arguments)] = (time.monotonic() + CACHEABLE_TOOLS[name], text)
+        while len(self._cache) > self.max_cache_entries:
+            self._cache.popitem(last=False)
+
+    @staticmethod
+    def _cache_key(tool_name: str, arguments: dict) -> tuple:
+        return tool_name, json.dumps(arguments, sort_keys=True, default=str)
+
+    # Compaction
+
+    def compact(self, tool_name: str, text: str) -> str:
+        """Fit a tool result into the tool's size limit"""
+        limit = TOOL_LIMITS.get(_match_tool(tool_name, TOOL_LIMITS), DEFAULT_LIMIT)
+
+        raw_note = ""
+        if _match_tool(tool_name, FETCH_TOOLS) and _HTML_RE.search(text[:2000]):
+            raw_ref = self._store(text)
+            text = html_to_text(text)
+            raw_note = (
+                f"\n[Converted from HTML. Call {READ_MORE_TOOL} "
+                f"with ref=\"{raw_ref}\" to read the raw page.]"
+            )
+
+        if len(text) <= limit:
+            return text + raw_note
+
+        ref = self._store(text)
+        if _match_tool(tool_name, LISTING_TOOLS) or self._looks_like_listing(text):
+            return self._summarize_listing(text, limit, ref) + raw_note
+        return self._head_tail(text, limit, ref) + raw_note
+
+    def read_more(self, ref: str, offset: Any = 0, length: Any = DEFAULT_LIMIT) -> str:
+        """Page through a stored full result
+
+        offset and length come straight from the model; missing values use
+        the defaults and invalid ones are reported back instead of raised.
+        """
+        text = self._stored.get(ref)
+        if text is None:
+            return f"No stored tool output with ref={ref} (it may have expired)."
+
+        try:
+            offset = 0 if offset is None else int(offset)
+            length = DEFAULT_LIMIT if length is None else int(length)
+        except (TypeError, ValueError):
+            return (
+                f"Invalid arguments for {READ_MORE_TOOL}: offset and length must be "
+                f"integers (got offset={offset!r}, length={length!r})."
+            )
+
+        self._stored.move_to_end(ref)
+        offset = max(0, offset)
+        length = max(1, min(length, DEFAULT_LIMIT))
+        chunk = text[offset:offset + length]
+        end = offset + len(chunk)
+        if end < len(text):
+            chunk += self._more_marker(ref, end, len(text) - end)
+        return chunk
+
+    def tool_schema(self) -> dict:
+        """Ollama tool definition for READ_MORE_TOOL"""
+        return {
+            "type": "function",
+            "function": {
+                "name": READ_MORE_TOOL,
+                "description": "Read more of a tool result that was truncated. Use the ref and offset given in the truncation note.",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "ref": {"type": "string", "description": "Reference from the truncation note"},
+                        "offset": {"type": "integer", "description": "Character offset to start reading from"},
+                        "length": {"type": "integer", "description": f"Characters to read (max {DEFAULT_LIMIT})"},
+                    },
+                    "required": ["ref"],
+                },
+            },
+        }
+
+    def _store(self, text: str) -> str:
+        ref = hashlib.sha1(text.encode("utf-8")).hexdigest()[:12]
+        self._stored[ref] = text
+        self._stored.move_to_end(ref)
+        while len(self._stored) > self.max_stored:
+            self._stored.popitem(last=False)
+        return ref
+
+    @staticmethod
+    def _more_marker(ref: str, offset: int, remaining: int) -> str:
+        return (
+            f"\n[... {remaining} more characters. Call {READ_MORE_TOOL} "
+            f"with ref=\"{ref}\" and offset={offset} to read more ...]"
+        )
+
+    def _head_tail(self, text: str, limit: int, ref: str) -> str:
+        head_len = int(limit * 0.7)
+        tail_len = limit - head_len
+        omitted = len(text) - head_len - tail_len
+        return (
+            text[:head_len]
+            + f"\n\n[... {omitted} characters omitted. Call {READ_MORE_TOOL} "
+              f"with ref=\"{ref}\" and offset={head_len} to read them ...]\n\n"
+            + text[-tail_len:]
+        )
+
+    @staticmethod
+    def _looks_like_listing(text: str) -> bool:
+        lines = text.splitlines()
+        return len(lines) >= 20 and sum(len(line) for line in lines) / len(lines) < 120
+
+    def _summarize_listing(self, text: str, limit: int, ref: str) -> str:
+        lines = text.splitlines()
+        kept, size = [], 0
+        for line in lines:
+            if size + len(line) + 1 > limit:
+                break
+            kept.append(line)
+            size += len(line) + 1
+
+        rest = lines[len(kept):]
+        files = sum(1 for line in rest if line.startswith("[FILE]"))
+        dirs = sum(1 for line in rest if line.startswith("[DIR]"))
+        detail = f" ({files} files, {dirs} directories)" if files or dirs else ""
+        return (
+            "\n".join(kept)
+            + f"\n[... {len(rest)} more entries{detail}. Call {READ_MORE_TOOL} "
+              f"with ref=\"{ref}\" and offset={size} to list them ...]"
+        )